@@ -72,50 +72,50 @@ def root():
 
 
 @app.get("/noticias")
-def listar_noticias(limite: int = 20, dias: int = 7, q: Optional[str] = None):
+def listar_noticias(limite: int = 20, dias: int = 7, q: Optional[str] = None, agrupar: bool = False):
     # Mantive como antes: filtro por string (funciona “ok” pro teu caso atual),
     # mas o foco aqui foi corrigir estatisticas.
     data_inicio = (datetime.now() - timedelta(days=dias)).isoformat()
 
+    filtro_pg = "data_publicacao >= %s"
+    filtro_sqlite = "data_publicacao >= ?"
+    params = (data_inicio,)
     if q:
         like = f"%{q}%"
-        rows = db.query_all(
-            """
-            SELECT id, titulo, url, fonte, data_publicacao, resumo, palavras_chave
-            FROM noticias
-            WHERE data_publicacao >= %s
-              AND (titulo ILIKE %s OR palavras_chave ILIKE %s)
-            ORDER BY data_publicacao DESC
-            LIMIT %s
-            """,
-            """
-            SELECT id, titulo, url, fonte, data_publicacao, resumo, palavras_chave
-            FROM noticias
-            WHERE data_publicacao >= ?
-              AND (titulo LIKE ? OR palavras_chave LIKE ?)
-            ORDER BY data_publicacao DESC
-            LIMIT ?
-            """,
-            (data_inicio, like, like, limite),
-        )
-    else:
-        rows = db.query_all(
-            """
-            SELECT id, titulo, url, fonte, data_publicacao, resumo, palavras_chave
-            FROM noticias
-            WHERE data_publicacao >= %s
-            ORDER BY data_publicacao DESC
-            LIMIT %s
-            """,
-            """
-            SELECT id, titulo, url, fonte, data_publicacao, resumo, palavras_chave
-            FROM noticias
-            WHERE data_publicacao >= ?
-            ORDER BY data_publicacao DESC
-            LIMIT ?
-            """,
-            (data_inicio, limite),
-        )
+        filtro_pg += " AND (titulo ILIKE %s OR palavras_chave ILIKE %s)"
+        filtro_sqlite += " AND (titulo LIKE ? OR palavras_chave LIKE ?)"
+        params += (like, like)
+
+    if agrupar:
+        # uma notícia (a mais recente) por cluster de quase duplicatas
+        filtro_pg = f"""id IN (
+                SELECT MAX(id) FROM noticias
+                WHERE {filtro_pg}
+                GROUP BY COALESCE(cluster_id, id)
+            )"""
+        filtro_sqlite = f"""id IN (
+                SELECT MAX(id) FROM noticias
+                WHERE {filtro_sqlite}
+                GROUP BY COALESCE(cluster_id, id)
+            )"""
+
+    rows = db.query_all(
+        f"""
+        SELECT id, titulo, url, fonte, data_publicacao, resumo, palavras_chave
+        FROM noticias
+        WHERE {filtro_pg}
+        ORDER BY data_publicacao DESC
+        LIMIT %s
+        """,
+        f"""
+        SELECT id, titulo, url, fonte, data_publicacao, resumo, palavras_chave
+        FROM noticias
+        WHERE {filtro_sqlite}
+        ORDER BY data_publicacao DESC
+        LIMIT ?
+        """,
+        params + (limite,),
+    )
 
     noticias = []
     for r in rows:
@@ -1,5 +1,8 @@
+import hashlib
 import os
+import re
 import sqlite3
+import unicodedata
 from datetime import datetime
 
 # -----------------------------------------------------------------------------
@@ -11,6 +14,9 @@ USE_POSTGRES = False
 DATABASE_URL = None
 DATABASE_PATH = os.getenv("DATABASE_PATH", "data/noticias.db")
 
+# Janela (em dias) em que uma notícia nova é comparada com as já gravadas
+DEDUP_DIAS = int(os.getenv("DEDUP_DIAS", "3"))
+
 if RAW_DATABASE_URL:
     DATABASE_URL = RAW_DATABASE_URL.strip()
 
@@ -27,6 +33,97 @@ else:
     psycopg2 = None  # noqa: E402
 
 
+# -----------------------------------------------------------------------------
+# SimHash (detecção de notícias quase duplicadas)
+# -----------------------------------------------------------------------------
+# Fingerprint de 64 bits guardado em 4 faixas de 16 bits. Duas notícias com
+# distância de Hamming <= 3 têm obrigatoriamente ao menos uma faixa idêntica,
+# então basta buscar quem compartilha alguma faixa dentro da janela de
+# DEDUP_DIAS (índices (faixa, created_at)) e conferir a distância só nesses.
+SIMHASH_BITS = 64
+SIMHASH_FAIXAS = 4
+SIMHASH_BITS_FAIXA = SIMHASH_BITS // SIMHASH_FAIXAS
+SIMHASH_MAX_DISTANCIA = SIMHASH_FAIXAS - 1
+# faixas de notícias sem texto para fingerprint (nunca casam; evita refazer o backfill)
+SIMHASH_VAZIO = -1
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# "Título - Fonte" (Google News e afins)
+_SUFIXO_FONTE_RE = re.compile(r"\s+[-–—|]\s+(?P<fonte>[^-–—|]+)$")
+# Fontes que aparecem como sufixo do título mesmo quando `fonte` é o agregador.
+# Só esses (ou a própria `fonte`) são cortados: "Guerra na Ucrânia - Rússia
+# ataca Kiev" é título, não fonte.
+FONTES_CONHECIDAS = {
+    "reuters", "ap news", "associated press", "afp", "bbc", "bbc news",
+    "cnn", "cnn brasil", "al jazeera", "the guardian", "defense news",
+    "military times", "g1", "folha de s.paulo", "estadao", "o globo",
+    "uol", "poder360", "agencia brasil",
+}
+
+
+def _normalizar(texto: str) -> str:
+    # minúsculas e sem acento, para "artilharia"/"Artilharia"/"artilhária" baterem
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def _limpar_titulo(titulo: str, fonte: str = "") -> str:
+    titulo = (titulo or "").strip()
+    m = _SUFIXO_FONTE_RE.search(titulo)
+    if not m:
+        return titulo
+    sufixo = _normalizar(m.group("fonte").strip())
+    if sufixo in FONTES_CONHECIDAS or (fonte and sufixo == _normalizar(fonte.strip())):
+        return titulo[: m.start()]
+    return titulo
+
+
+def _tokens(texto: str) -> list:
+    texto = _normalizar(texto)
+    # "U.S." -> "us", "Kyiv's" -> "kyiv"
+    texto = re.sub(r"(?<=\w)\.(?=\w)", "", texto)
+    texto = re.sub(r"['’]s\b", "", texto)
+    # descarta só letras soltas; números ("3 mortos" x "9 mortos") ficam
+    return [t for t in _TOKEN_RE.findall(texto) if len(t) > 1 or t.isdigit()]
+
+
+def calcular_simhash(titulo: str, resumo: str = "", fonte: str = ""):
+    """
+    SimHash de 64 bits de titulo (sem o sufixo " - Fonte") + resumo, usando
+    palavras e pares de palavras. Retorna None se não houver texto suficiente.
+    """
+    palavras = _tokens(f"{_limpar_titulo(titulo, fonte)} {resumo or ''}")
+    if not palavras:
+        return None
+
+    features = palavras + [f"{a} {b}" for a, b in zip(palavras, palavras[1:])]
+
+    pesos = [0] * SIMHASH_BITS
+    for f in features:
+        h = int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(SIMHASH_BITS):
+            pesos[i] += 1 if (h >> i) & 1 else -1
+
+    valor = 0
+    for i, p in enumerate(pesos):
+        if p > 0:
+            valor |= 1 << i
+    return valor
+
+
+def faixas_simhash(valor: int) -> list:
+    mascara = (1 << SIMHASH_BITS_FAIXA) - 1
+    return [(valor >> (i * SIMHASH_BITS_FAIXA)) & mascara for i in range(SIMHASH_FAIXAS)]
+
+
+def simhash_das_faixas(faixas) -> int:
+    return sum(f << (i * SIMHASH_BITS_FAIXA) for i, f in enumerate(faixas))
+
+
+def distancia_hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
 class Database:
     def __init__(self):
         if USE_POSTGRES:
@@ -73,6 +170,9 @@ class Database:
                 );
                 """
             )
+            # colunas de deduplicação (bancos criados antes delas)
+            for col in self._colunas_dedup():
+                cur.execute(f"ALTER TABLE noticias ADD COLUMN IF NOT EXISTS {col} INTEGER;")
         else:
             cur.execute(
                 """
@@ -102,8 +202,75 @@ class Database:
                 );
                 """
             )
+            cur.execute("PRAGMA table_info(noticias);")
+            existentes = {r[1] for r in cur.fetchall()}
+            for col in self._colunas_dedup():
+                if col not in existentes:
+                    cur.execute(f"ALTER TABLE noticias ADD COLUMN {col} INTEGER;")
+
+        # (faixa, created_at): a busca só lê candidatos da janela de DEDUP_DIAS
+        for i in range(SIMHASH_FAIXAS):
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_noticias_faixa{i}_criacao "
+                f"ON noticias (simhash_b{i}, created_at);"
+            )
+
+        if not USE_POSTGRES:
             self.conn.commit()
 
+        self._preencher_simhash()
+
+    @staticmethod
+    def _colunas_dedup():
+        return [f"simhash_b{i}" for i in range(SIMHASH_FAIXAS)] + ["cluster_id"]
+
+    def _preencher_simhash(self, lote: int = 500):
+        """
+        Calcula o simhash (e o cluster) das notícias gravadas antes da
+        deduplicação existir, em lotes, para que /noticias?agrupar=1 e as
+        notícias novas também as considerem.
+        """
+        ph = self._placeholder()
+        faixas_sql = ", ".join(f"simhash_b{i} = {ph}" for i in range(SIMHASH_FAIXAS))
+        cur = self.conn.cursor()
+        ultimo_id = 0
+        while True:
+            rows = self.query_all(
+                """
+                SELECT id, titulo, resumo, fonte, created_at
+                FROM noticias
+                WHERE simhash_b0 IS NULL AND id > %s
+                ORDER BY id
+                LIMIT %s
+                """,
+                """
+                SELECT id, titulo, resumo, fonte, created_at
+                FROM noticias
+                WHERE simhash_b0 IS NULL AND id > ?
+                ORDER BY id
+                LIMIT ?
+                """,
+                (ultimo_id, lote),
+            )
+            if not rows:
+                break
+
+            for noticia_id, titulo, resumo, fonte, criado_em in rows:
+                ultimo_id = noticia_id
+                simhash = calcular_simhash(titulo, resumo, fonte)
+                if simhash is None:
+                    faixas, cluster_id = [SIMHASH_VAZIO] * SIMHASH_FAIXAS, None
+                else:
+                    faixas = faixas_simhash(simhash)
+                    cluster_id = self.buscar_cluster(simhash, referencia=criado_em)
+                cur.execute(
+                    f"UPDATE noticias SET {faixas_sql}, cluster_id = {ph} WHERE id = {ph}",
+                    (*faixas, cluster_id, noticia_id),
+                )
+
+            if not USE_POSTGRES:
+                self.conn.commit()
+
     # -----------------------------------------------------------------------------
     # Helpers de query (para endpoints não precisarem saber se é Postgres ou SQLite)
     # -----------------------------------------------------------------------------
@@ -138,27 +305,83 @@ class Database:
         )
         return row is not None
 
+    def buscar_cluster(self, simhash: int, referencia=None):
+        """
+        Procura uma quase duplicata do simhash entre as notícias gravadas nos
+        DEDUP_DIAS dias anteriores a `referencia` (padrão: agora). Retorna o id
+        do cluster (id da notícia representante) ou None.
+        """
+        faixas = faixas_simhash(simhash)
+
+        # cada termo do OR usa o índice (simhash_bX, created_at) inteiro
+        if USE_POSTGRES:
+            fim = "COALESCE(%s::timestamp, LOCALTIMESTAMP)"
+            janela = f"created_at BETWEEN {fim} - %s * INTERVAL '1 day' AND {fim}"
+            params_janela = (referencia, DEDUP_DIAS, referencia)
+            ph = "%s"
+        else:
+            janela = "created_at BETWEEN datetime(COALESCE(?, 'now'), ?) AND datetime(COALESCE(?, 'now'))"
+            params_janela = (referencia, f"-{DEDUP_DIAS} days", referencia)
+            ph = "?"
+
+        termos = " OR ".join(f"(simhash_b{i} = {ph} AND {janela})" for i in range(SIMHASH_FAIXAS))
+        params = tuple(p for f in faixas for p in (f, *params_janela))
+        sql = f"""
+            SELECT id, cluster_id, {", ".join(f"simhash_b{i}" for i in range(SIMHASH_FAIXAS))}
+            FROM noticias
+            WHERE {termos}
+            ORDER BY id
+        """
+        rows = self.query_all(sql, sql, params)
+
+        for noticia_id, cluster_id, *faixas_row in rows:
+            if distancia_hamming(simhash, simhash_das_faixas(faixas_row)) <= SIMHASH_MAX_DISTANCIA:
+                return cluster_id or noticia_id
+        return None
+
     def adicionar_noticia(self, titulo, url, fonte, data_pub, resumo="", keywords=""):
+        """
+        Grava a notícia e retorna o id (None se a URL já existe ou deu erro).
+        Quase duplicatas de uma notícia recente também são gravadas, com
+        cluster_id apontando para a representante (ver /noticias?agrupar=1).
+        """
+        faixas, cluster_id = [SIMHASH_VAZIO] * SIMHASH_FAIXAS, None
+        try:
+            # antes do fingerprint, senão a URL repetida casaria consigo mesma
+            if self.noticia_existe(url):
+                return None
+            simhash = calcular_simhash(titulo, resumo, fonte)
+            if simhash is not None:
+                faixas = faixas_simhash(simhash)
+                cluster_id = self.buscar_cluster(simhash)
+        except Exception:
+            # falha na deduplicação não pode descartar a notícia
+            cluster_id = None
+
+        params = (titulo, url, fonte, data_pub, resumo, keywords, *faixas, cluster_id)
+        colunas = ", ".join(self._colunas_dedup())
+        ph = ", ".join([self._placeholder()] * len(params))
+
         try:
             if USE_POSTGRES:
                 cur = self.exec(
-                    """
-                    INSERT INTO noticias (titulo, url, fonte, data_publicacao, resumo, palavras_chave)
-                    VALUES (%s, %s, %s, %s, %s, %s)
+                    f"""
+                    INSERT INTO noticias (titulo, url, fonte, data_publicacao, resumo, palavras_chave, {colunas})
+                    VALUES ({ph})
                     RETURNING id
                     """,
                     "",
-                    (titulo, url, fonte, data_pub, resumo, keywords),
+                    params,
                 )
                 return cur.fetchone()[0]
             else:
                 cur = self.exec(
                     "",
-                    """
-                    INSERT INTO noticias (titulo, url, fonte, data_publicacao, resumo, palavras_chave)
-                    VALUES (?, ?, ?, ?, ?, ?)
+                    f"""
+                    INSERT INTO noticias (titulo, url, fonte, data_publicacao, resumo, palavras_chave, {colunas})
+                    VALUES ({ph})
                     """,
-                    (titulo, url, fonte, data_pub, resumo, keywords),
+                    params,
                 )
                 return cur.lastrowid
         except Exception:
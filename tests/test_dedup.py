@@ -0,0 +1,258 @@
+import importlib.util
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+import database
+from database import (
+    SIMHASH_BITS,
+    SIMHASH_MAX_DISTANCIA,
+    SIMHASH_VAZIO,
+    Database,
+    calcular_simhash,
+    distancia_hamming,
+    faixas_simhash,
+    simhash_das_faixas,
+)
+
+TEM_FASTAPI = importlib.util.find_spec("fastapi") is not None
+
+# mesma notícia de agência, publicada por fontes diferentes (formato Google News)
+KYIV = "Russia launches missile strike on Kyiv energy grid"
+BLINDADOS = "Exército brasileiro recebe novos blindados"
+OBUSEIROS = "Exército brasileiro recebe novos obuseiros"
+
+SCHEMA_ANTIGO = """
+    CREATE TABLE noticias (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        titulo TEXT NOT NULL,
+        url TEXT UNIQUE NOT NULL,
+        fonte TEXT,
+        data_publicacao TEXT,
+        resumo TEXT,
+        palavras_chave TEXT,
+        enviado BOOLEAN DEFAULT 0,
+        data_envio TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+
+class BaseSqlite(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "noticias.db")
+        self._path_original = database.DATABASE_PATH
+        database.DATABASE_PATH = self.path
+        self._bancos = []
+
+    def tearDown(self):
+        for db in self._bancos:
+            db.fechar()
+        database.DATABASE_PATH = self._path_original
+        self.tmp.cleanup()
+
+    def abrir(self):
+        db = Database()
+        self._bancos.append(db)
+        return db
+
+    def criar_banco_antigo(self, linhas):
+        conn = sqlite3.connect(self.path)
+        conn.execute(SCHEMA_ANTIGO)
+        conn.executemany(
+            "INSERT INTO noticias (titulo, url, fonte, data_publicacao, resumo) VALUES (?, ?, ?, ?, ?)",
+            linhas,
+        )
+        conn.commit()
+        conn.close()
+
+
+class TestSimhash(unittest.TestCase):
+    def test_faixas_ida_e_volta(self):
+        valor = 0xDEADBEEFCAFEF00D
+        self.assertEqual(simhash_das_faixas(faixas_simhash(valor)), valor)
+
+    def test_ate_max_distancia_sempre_compartilha_faixa(self):
+        valor = calcular_simhash(KYIV)
+        for bits in [(0, 16, 32), (1, 2, 3), (15, 31, 47), (60, 61, 62), (5, 21, 63)]:
+            outro = valor
+            for b in bits:
+                outro ^= 1 << b
+            self.assertLessEqual(distancia_hamming(valor, outro), SIMHASH_MAX_DISTANCIA)
+            comuns = [a == b for a, b in zip(faixas_simhash(valor), faixas_simhash(outro))]
+            self.assertTrue(any(comuns))
+
+    def test_sufixo_da_fonte_ignorado(self):
+        base = calcular_simhash(KYIV)
+        self.assertEqual(calcular_simhash(f"{KYIV} - Reuters", fonte="Reuters"), base)
+        self.assertEqual(calcular_simhash(f"{KYIV} - AP News"), base)
+        self.assertEqual(
+            calcular_simhash(f"{BLINDADOS} - Folha de S.Paulo"),
+            calcular_simhash(f"{BLINDADOS} - G1"),
+        )
+
+    def test_variacoes_de_grafia(self):
+        self.assertLessEqual(
+            distancia_hamming(
+                calcular_simhash("Ukraine receives new batch of HIMARS launchers from U.S."),
+                calcular_simhash("Ukraine receives new batch of HIMARS launchers from US"),
+            ),
+            SIMHASH_MAX_DISTANCIA,
+        )
+
+    def test_noticias_diferentes_nao_agrupam(self):
+        pares = [
+            (BLINDADOS, OBUSEIROS),
+            (KYIV, "Russia launches drone strike on Odesa port"),
+            ("Poland signs deal for 180 K9 howitzers", "Poland signs deal for 96 Apache helicopters"),
+        ]
+        for a, b in pares:
+            self.assertGreater(
+                distancia_hamming(calcular_simhash(f"{a} - G1"), calcular_simhash(f"{b} - G1")),
+                SIMHASH_MAX_DISTANCIA,
+            )
+
+    def test_sufixo_que_nao_e_fonte_nao_e_cortado(self):
+        titulo = "Ukraine war - what we know about the new HIMARS deliveries so far"
+        self.assertNotEqual(calcular_simhash(titulo), calcular_simhash("Ukraine war"))
+        self.assertGreater(
+            distancia_hamming(
+                calcular_simhash("Guerra na Ucrânia - Rússia ataca Kiev", fonte="Google News"),
+                calcular_simhash("Guerra na Ucrânia - Ucrânia derruba drones", fonte="Google News"),
+            ),
+            SIMHASH_MAX_DISTANCIA,
+        )
+
+    def test_sufixo_igual_a_fonte_e_cortado(self):
+        self.assertEqual(
+            calcular_simhash(f"{KYIV} - Kyiv Independent", fonte="Kyiv Independent"),
+            calcular_simhash(KYIV),
+        )
+
+    def test_numeros_contam(self):
+        pares = [
+            ("Ataque deixa 3 mortos em Kiev", "Ataque deixa 9 mortos em Kiev"),
+            ("Exército recebe 5 obuseiros", "Exército recebe 8 obuseiros"),
+        ]
+        for a, b in pares:
+            self.assertNotEqual(calcular_simhash(a), calcular_simhash(b))
+
+    def test_sem_texto(self):
+        self.assertIsNone(calcular_simhash("", ""))
+        self.assertLess(calcular_simhash(KYIV), 1 << SIMHASH_BITS)
+
+
+class TestDeduplicacao(BaseSqlite):
+    def test_copia_entra_no_cluster(self):
+        db = self.abrir()
+        original = db.adicionar_noticia(f"{KYIV} - Reuters", "https://a/1", "Reuters", "x")
+        copia = db.adicionar_noticia(f"{KYIV} - AP News", "https://b/1", "AP News", "x")
+
+        self.assertIsNotNone(copia)
+        self.assertEqual(
+            db.query_one("", "SELECT cluster_id FROM noticias WHERE id = ?", (copia,))[0],
+            original,
+        )
+        self.assertIsNone(db.query_one("", "SELECT cluster_id FROM noticias WHERE id = ?", (original,))[0])
+
+    def test_mesma_url_nao_vira_cluster_de_si_mesma(self):
+        db = self.abrir()
+        self.assertIsNotNone(db.adicionar_noticia(KYIV, "https://x/1", "Reuters", "x"))
+        self.assertIsNone(db.adicionar_noticia(KYIV, "https://x/1", "Reuters", "x"))
+        self.assertEqual(
+            db.query_all("", "SELECT id, cluster_id FROM noticias"),
+            [(1, None)],
+        )
+
+    def test_noticias_diferentes_sao_gravadas(self):
+        db = self.abrir()
+        self.assertIsNotNone(db.adicionar_noticia(f"{BLINDADOS} - G1", "https://g1/1", "G1", "x"))
+        self.assertIsNotNone(db.adicionar_noticia(f"{OBUSEIROS} - G1", "https://g1/2", "G1", "x"))
+
+    def test_fora_da_janela_nao_agrupa(self):
+        db = self.abrir()
+        antiga = db.adicionar_noticia(KYIV, "https://a/1", "Reuters", "x")
+        db.exec("", "UPDATE noticias SET created_at = '2025-01-01 00:00:00' WHERE id = ?", (antiga,))
+
+        nova = db.adicionar_noticia(KYIV, "https://b/1", "AP News", "x")
+        self.assertIsNone(db.query_one("", "SELECT cluster_id FROM noticias WHERE id = ?", (nova,))[0])
+
+    def test_falha_na_busca_nao_perde_noticia(self):
+        db = self.abrir()
+
+        def quebrada(*args, **kwargs):
+            raise sqlite3.OperationalError("no such column: simhash_b0")
+
+        db.buscar_cluster = quebrada
+        self.assertIsNotNone(db.adicionar_noticia(KYIV, "https://a/1", "Reuters", "x"))
+
+    def test_migracao_preenche_e_agrupa_antigas(self):
+        self.criar_banco_antigo(
+            [
+                (f"{KYIV} - Reuters", "https://a/1", "Reuters", "x", ""),
+                (f"{KYIV} - AP News", "https://b/1", "AP News", "x", ""),
+                (f"{BLINDADOS} - G1", "https://g1/1", "G1", "x", ""),
+                ("!", "https://vazio/1", "G1", "x", ""),
+            ]
+        )
+        db = self.abrir()
+
+        rows = db.query_all("", "SELECT id, simhash_b0, cluster_id FROM noticias ORDER BY id")
+        self.assertTrue(all(r[1] is not None for r in rows))
+        self.assertEqual(rows[3][1], SIMHASH_VAZIO)
+        self.assertEqual([r[2] for r in rows], [None, 1, None, None])
+        # copia nova de uma notícia antiga também é reconhecida
+        nova = db.adicionar_noticia(f"{KYIV} - BBC", "https://c/1", "BBC", "x")
+        self.assertEqual(db.query_one("", "SELECT cluster_id FROM noticias WHERE id = ?", (nova,))[0], 1)
+
+        # nada fica pendente para o próximo boot
+        self.assertIsNone(db.query_one("", "SELECT id FROM noticias WHERE simhash_b0 IS NULL"))
+
+
+@unittest.skipUnless(TEM_FASTAPI, "fastapi não instalado")
+class TestListarAgrupado(BaseSqlite):
+    def setUp(self):
+        super().setUp()
+        hoje = datetime.now().isoformat()
+        self.criar_banco_antigo(
+            [
+                (f"{KYIV} - Reuters", "https://a/1", "Reuters", hoje, ""),
+                (f"{KYIV} - AP News", "https://b/1", "AP News", hoje, ""),
+                (f"{BLINDADOS} - G1", "https://g1/1", "G1", hoje, ""),
+            ]
+        )
+        import api
+
+        self.api = api
+        self._db_original = api.db
+        api.db = self.abrir()
+
+    def tearDown(self):
+        self.api.db = self._db_original
+        super().tearDown()
+
+    def test_sem_agrupar(self):
+        self.assertEqual(self.api.listar_noticias()["total"], 3)
+
+    def test_agrupar(self):
+        resp = self.api.listar_noticias(agrupar=True)
+        self.assertEqual(resp["total"], 2)
+        self.assertEqual(sorted(n["id"] for n in resp["noticias"]), [2, 3])
+
+    def test_agrupar_com_busca(self):
+        resp = self.api.listar_noticias(q="Kyiv", agrupar=True)
+        self.assertEqual([n["id"] for n in resp["noticias"]], [2])
+
+    def test_agrupar_noticias_novas(self):
+        hoje = datetime.now().isoformat()
+        nova = self.api.db.adicionar_noticia(f"{KYIV} - BBC", "https://c/1", "BBC", hoje)
+        resp = self.api.listar_noticias(agrupar=True)
+        self.assertEqual(sorted(n["id"] for n in resp["noticias"]), [3, nova])
+        self.assertEqual(self.api.listar_noticias()["total"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()